@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import argparse
+
+import lib.evaluation as evaluation
+import lib.keyword_search as keyword_search
+
+def float_list(value: str) -> list[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Search Evaluation CLI")
+    parser.add_argument(
+        "--dataset", default="data/golden_dataset.json", help="judged query set")
+    parser.add_argument("--k", type=int, default=5, help="cutoff for recall@k and ndcg@k")
+    subparsers = parser.add_subparsers(dest="command", help="available commands")
+    evaluate_parser = subparsers.add_parser("evaluate", help="evaluate bm25 search")
+    evaluate_parser.add_argument(
+        "--k1", type=float, default=keyword_search.BM25_K1, help="BM25 k1 parameter")
+    evaluate_parser.add_argument(
+        "--b", type=float, default=keyword_search.BM25_B, help="BM25 b parameter")
+    sweep_bm25_parser = subparsers.add_parser("sweep_bm25", help="sweep bm25 k1 and b values")
+    sweep_bm25_parser.add_argument(
+        "--k1", type=float_list, default=[1.0, 1.2, 1.5, 2.0], help="k1 values, comma-separated")
+    sweep_bm25_parser.add_argument(
+        "--b", type=float_list, default=[0.5, 0.75, 1.0], help="b values, comma-separated")
+    sweep_hybrid_parser = subparsers.add_parser(
+        "sweep_hybrid", help="sweep hybrid fusion alpha and rrf k values")
+    sweep_hybrid_parser.add_argument(
+        "--alpha", type=float_list, default=[0.0, 0.25, 0.5, 0.75, 1.0],
+        help="weighted fusion alpha values, comma-separated")
+    sweep_hybrid_parser.add_argument(
+        "--rrf-k", type=float_list, default=[20, 60, 100],
+        help="reciprocal rank fusion k values, comma-separated")
+
+    args = parser.parse_args()
+    match args.command:
+        case "evaluate":
+            evaluation.evaluate_command(args.dataset, args.k, args.k1, args.b)
+
+        case "sweep_bm25":
+            evaluation.sweep_bm25_command(args.dataset, args.k, args.k1, args.b)
+
+        case "sweep_hybrid":
+            evaluation.sweep_hybrid_command(args.dataset, args.k, args.alpha, args.rrf_k)
+
+        case _:
+            parser.print_help()
+
+if __name__ == "__main__":
+    main()
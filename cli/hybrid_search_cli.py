@@ -3,18 +3,54 @@
 import argparse
 
 import lib.hybrid_search as hybrid_search
+import lib.search_snapshot as search_snapshot
 
 def main():
     parser = argparse.ArgumentParser(description="Hybrid Search CLI")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     normalize_parser = subparsers.add_parser("normalize", help="normalize")
     normalize_parser.add_argument("scores", nargs="+", type=float, help="scores")
+    weighted_search_parser = subparsers.add_parser(
+        "weighted_search", help="hybrid search with weighted score fusion")
+    weighted_search_parser.add_argument("query", help="query text")
+    weighted_search_parser.add_argument(
+        "--alpha", type=float, default=0.5, help="weight of bm25 scores against semantic scores")
+    weighted_search_parser.add_argument("--limit", type=int, default=5, help="results limit")
+    rrf_search_parser = subparsers.add_parser(
+        "rrf_search", help="hybrid search with reciprocal rank fusion")
+    rrf_search_parser.add_argument("query", help="query text")
+    rrf_search_parser.add_argument("-k", type=float, default=60, help="rrf k parameter")
+    rrf_search_parser.add_argument("--limit", type=int, default=5, help="results limit")
+    batch_search_parser = subparsers.add_parser(
+        "batch_search", help="run many queries concurrently against one index snapshot")
+    batch_search_parser.add_argument("queries", nargs="+", help="query texts")
+    batch_search_parser.add_argument(
+        "--mode", choices=["bm25", "chunked"], default="bm25", help="search mode")
+    batch_search_parser.add_argument("--limit", type=int, default=5, help="results limit")
+    batch_search_parser.add_argument("--workers", type=int, default=None, help="worker threads")
+    batch_search_parser.add_argument(
+        "--candidate-multiplier", type=int, default=None,
+        help="chunked mode: score chunks of only limit * multiplier documents by centroid")
 
     args = parser.parse_args()
     match args.command:
         case "normalize":
             hybrid_search.normalize_command(args.scores)
 
+        case "weighted_search":
+            hybrid_search.hybrid_search_command(args.query, args.limit, alpha=args.alpha)
+
+        case "rrf_search":
+            hybrid_search.hybrid_search_command(args.query, args.limit, k=args.k)
+
+        case "batch_search":
+            if args.workers is not None and args.workers < 1:
+                parser.error("--workers must be at least 1")
+            if args.candidate_multiplier is not None and args.candidate_multiplier < 1:
+                parser.error("--candidate-multiplier must be at least 1")
+            search_snapshot.batch_search_command(
+                args.queries, args.limit, args.mode, args.workers, args.candidate_multiplier)
+
         case _:
             parser.print_help()
 
@@ -2,22 +2,14 @@
 
 import argparse
 import json
-import math
-import string
 
-from nltk.stem import PorterStemmer
-
-import lib.keyword_search
+import lib.keyword_search as keyword_search
 
 def main() -> None:
     with open('data/movies.json', 'r') as f:
         movies_data = json.load(f)
     movies = sorted(movies_data['movies'], key=lambda x: x['id'])
 
-    with open('data/stopwords.txt', 'r') as f:
-        stop_words = f.read().splitlines()
-
-    stemmer = PorterStemmer()
     inverted_index = keyword_search.InvertedIndex()
 
     parser = argparse.ArgumentParser(description="Keyword Search CLI")
@@ -26,19 +18,21 @@ def main() -> None:
     search_parser.add_argument("query", type=str, help="search query")
     subparsers.add_parser("build", help="build search index")
     tf_parser = subparsers.add_parser("tf", help="term frequency")
-    tf_parser.add_argument("doc_id", help="document id")
-    tf_parser.add_argument("term", help="term to count in a document")
+    tf_parser.add_argument("doc_id", type=int_list, help="document id(s), comma-separated")
+    tf_parser.add_argument("term", type=str_list, help="term(s) to count in a document")
     idf_parser = subparsers.add_parser("idf", help="inverse document frequency")
-    idf_parser.add_argument("term", help="term to count in all documents")
+    idf_parser.add_argument("term", type=str_list, help="term(s) to count in all documents")
     tfidf_parser = subparsers.add_parser("tfidf", help="calculate tf-idf")
-    tfidf_parser.add_argument("doc_id", help="document id")
-    tfidf_parser.add_argument("term", help="term to analyze for a document")
+    tfidf_parser.add_argument("doc_id", type=int_list, help="document id(s), comma-separated")
+    tfidf_parser.add_argument("term", type=str_list, help="term(s) to analyze for a document")
     bm25_idf_parser = subparsers.add_parser("bm25idf", help="Get BM25 IDF score for a given term")
-    bm25_idf_parser.add_argument("term", type=str, help="Term to get BM25 IDF score for")
+    bm25_idf_parser.add_argument(
+        "term", type=str_list, help="Term(s) to get BM25 IDF score for, comma-separated")
     bm25_tf_parser = subparsers.add_parser(
         "bm25tf", help="Get BM25 TF score for a given document ID and term")
-    bm25_tf_parser.add_argument("doc_id", type=int, help="Document ID")
-    bm25_tf_parser.add_argument("term", type=str, help="Term to get BM25 TF score for")
+    bm25_tf_parser.add_argument("doc_id", type=int_list, help="Document ID(s), comma-separated")
+    bm25_tf_parser.add_argument(
+        "term", type=str_list, help="Term(s) to get BM25 TF score for, comma-separated")
     bm25_tf_parser.add_argument(
         "k1", type=float, nargs='?',
         default=keyword_search.BM25_K1, help="Tunable BM25 K1 parameter")
@@ -81,9 +75,14 @@ def main() -> None:
                 return
 
             try:
-                print(inverted_index.get_tf(args.doc_id, args.term))
+                tfs = inverted_index.get_tfs(args.doc_id, args.term)
             except Exception as e:
                 print(e)
+                return
+
+            for i, doc_id in enumerate(args.doc_id):
+                for j, term in enumerate(args.term):
+                    print(f"Term frequency of '{term}' in document '{doc_id}': {int(tfs[i, j])}")
 
         case "idf":
             try:
@@ -92,17 +91,28 @@ def main() -> None:
                 print(f"Error loading inverted index: {e}")
                 return
 
-            doc_count, term_doc_count = inverted_index.get_idf(args.term)
-            idf = math.log((doc_count + 1) / (term_doc_count + 1))
-            print(f"Inverse document frequency of '{args.term}': {idf:.2f}")
+            try:
+                idfs = inverted_index.get_idfs(args.term)
+            except Exception as e:
+                print(e)
+                return
+
+            for term, idf in zip(args.term, idfs):
+                print(f"Inverse document frequency of '{term}': {idf:.2f}")
 
         case "bm25idf":
-            bm25_idf = bm25_idf_command(args.term)
-            print(f"BM25 IDF score of '{args.term}': {bm25_idf:.2f}")
+            bm25_idfs = bm25_idf_command(args.term)
+            for term, bm25_idf in zip(args.term, bm25_idfs):
+                print(f"BM25 IDF score of '{term}': {bm25_idf:.2f}")
 
         case "bm25tf":
-            bm25_tf = bm25_tf_command(args.doc_id, args.term, args.k1, args.b)
-            print(f"BM25 TF score of '{args.term}' in document '{args.doc_id}': {bm25_tf:.2f}")
+            bm25_tfs = bm25_tf_command(args.doc_id, args.term, args.k1, args.b)
+            if len(bm25_tfs) == 0:
+                return
+            for i, doc_id in enumerate(args.doc_id):
+                for j, term in enumerate(args.term):
+                    bm25_tf = bm25_tfs[i][j]
+                    print(f"BM25 TF score of '{term}' in document '{doc_id}': {bm25_tf:.2f}")
 
         case "bm25search":
             results = bm25_search_command(args.query, args.limit)
@@ -118,19 +128,15 @@ def main() -> None:
                 return
 
             try:
-                stemmer = PorterStemmer()
-                tokens = args.term.lower().split()
-                if len(tokens) != 1:
-                    raise Exception("expected one token")
-                token = stemmer.stem(tokens[0])
-
-                tf = inverted_index.get_tf(args.doc_id, token)
-                doc_count, term_doc_count = inverted_index.get_idf(token)
-                idf = math.log((doc_count + 1) / (term_doc_count + 1))
-                tf_idf = tf * idf
-                print(f"TF-IDF score of '{args.term}' in document '{args.doc_id}': {tf_idf:.2f}")
+                tf_idfs = inverted_index.get_tfidfs(args.doc_id, args.term)
             except Exception as e:
                 print(e)
+                return
+
+            for i, doc_id in enumerate(args.doc_id):
+                for j, term in enumerate(args.term):
+                    tf_idf = tf_idfs[i, j]
+                    print(f"TF-IDF score of '{term}' in document '{doc_id}': {tf_idf:.2f}")
 
         case "build":
             inverted_index.build(movies)
@@ -139,25 +145,39 @@ def main() -> None:
         case _:
             parser.print_help()
 
-def bm25_idf_command(term):
+def int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+def str_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def bm25_idf_command(terms):
     try:
         inverted_index = keyword_search.InvertedIndex()
         inverted_index.load()
     except Exception as e:
         print(f"Error loading inverted index: {e}")
-        return 0
+        return []
 
-    return inverted_index.get_bm25_idf(term)
+    try:
+        return inverted_index.get_bm25_idfs(terms)
+    except Exception as e:
+        print(e)
+        return []
 
-def bm25_tf_command(doc_id, term, k1=keyword_search.BM25_K1, b=keyword_search.BM25_B):
+def bm25_tf_command(doc_ids, terms, k1=keyword_search.BM25_K1, b=keyword_search.BM25_B):
     try:
         inverted_index = keyword_search.InvertedIndex()
         inverted_index.load()
     except Exception as e:
         print(f"Error loading inverted index: {e}")
-        return 0
+        return []
 
-    return inverted_index.get_bm25_tf(doc_id, term, k1, b)
+    try:
+        return inverted_index.get_bm25_tfs(doc_ids, terms, k1, b)
+    except Exception as e:
+        print(e)
+        return []
 
 def bm25_search_command(query, limit):
     try:
@@ -0,0 +1,177 @@
+import itertools
+import json
+import os
+
+import numpy
+
+from .hybrid_search import rrf_scores, weighted_scores
+from .keyword_search import BM25_B, BM25_K1, InvertedIndex, tokenize
+from .semantic_search import ChunkedSemanticSearch, load_movies
+
+class Evaluator:
+    """
+    Scores a judged query set against a loaded InvertedIndex.
+
+    Only the document-term entries of the query terms are kept, together with
+    their term frequencies and the document lengths, so every (k1, b) grid
+    point is a vectorized rescoring of that slice with no index rebuild.
+    """
+
+    def __init__(self, index: InvertedIndex, test_cases: list[dict]):
+        self.matrix = index.get_doc_term_matrix()
+        self.queries = [test_case['query'] for test_case in test_cases]
+
+        # relevance[i, j] is True when document doc_ids[j] is relevant to query i
+        titles = {document['title']: doc_id for doc_id, document in index.docmap.items()}
+        self.relevance = numpy.zeros((len(test_cases), len(self.matrix.doc_ids)), dtype=bool)
+        for i, test_case in enumerate(test_cases):
+            for relevant in test_case['relevant_docs']:
+                doc_id = titles.get(relevant, relevant)
+                if doc_id not in self.matrix.doc_rows:
+                    raise ValueError(f"Unknown relevant document '{relevant}'")
+                self.relevance[i, self.matrix.doc_rows[doc_id]] = True
+
+        # query_terms[i, c] counts how often the c-th used column appears in query i
+        query_vectors = numpy.array([self.matrix.query_vector(tokenize(query))
+                                     for query in self.queries]).reshape(
+                                         len(self.queries), len(self.matrix.vocabulary))
+        used_columns = numpy.flatnonzero(query_vectors.any(axis=0))
+        self.query_terms = query_vectors[:, used_columns]
+
+        column_positions = numpy.full(len(self.matrix.vocabulary), -1, dtype=numpy.int64)
+        column_positions[used_columns] = numpy.arange(len(used_columns))
+        entries = column_positions[self.matrix.indices] >= 0
+        self.rows = self.matrix.rows[entries]
+        self.columns = column_positions[self.matrix.indices[entries]]
+        self.tf = self.matrix.tf[entries]
+        self.bm25_idf = self.matrix.bm25_idf()[used_columns]
+
+        self.semantic_scores = None
+
+    def bm25_scores(self, k1: float = BM25_K1, b: float = BM25_B) -> numpy.ndarray:
+        """Returns a queries x documents array of BM25 scores."""
+        norms = self.matrix.length_norms(b)[self.rows]
+        weights = (self.tf * (k1 + 1)) / (self.tf + k1 * norms) * self.bm25_idf[self.columns]
+
+        scores = numpy.zeros(self.relevance.shape)
+        for i, query_terms in enumerate(self.query_terms):
+            scores[i] = numpy.bincount(
+                self.rows, weights=weights * query_terms[self.columns],
+                minlength=len(self.matrix.doc_ids))
+        return scores
+
+    def load_semantic_scores(self, search: ChunkedSemanticSearch) -> numpy.ndarray:
+        """Embeds every query once with a ChunkedSemanticSearch that has chunk embeddings loaded."""
+        if self.semantic_scores is None:
+            query_embeds = search.model.encode(self.queries)
+            self.semantic_scores = numpy.array(
+                [search.score_documents(query_embed, self.matrix.doc_ids)
+                 for query_embed in query_embeds]).reshape(self.relevance.shape)
+        return self.semantic_scores
+
+    def evaluate(self, scores: numpy.ndarray, k: int,
+                 retrieved: numpy.ndarray | None = None) -> dict:
+        return ranking_metrics(scores, self.relevance, k, retrieved)
+
+    def sweep_bm25(self, k1_values: list[float], b_values: list[float], k: int) -> list[dict]:
+        results = []
+        for k1, b in itertools.product(k1_values, b_values):
+            scores = self.bm25_scores(k1, b)
+            metrics = self.evaluate(scores, k, scores > 0)
+            results.append({"k1": k1, "b": b, **metrics})
+        return results
+
+    def sweep_weighted(self, search: ChunkedSemanticSearch, alpha_values: list[float], k: int,
+                       k1: float = BM25_K1, b: float = BM25_B) -> list[dict]:
+        bm25_scores = self.bm25_scores(k1, b)
+        semantic_scores = self.load_semantic_scores(search)
+        results = []
+        for alpha in alpha_values:
+            metrics = self.evaluate(weighted_scores(bm25_scores, semantic_scores, alpha), k)
+            results.append({"alpha": alpha, **metrics})
+        return results
+
+    def sweep_rrf(self, search: ChunkedSemanticSearch, rrf_k_values: list[float], k: int,
+                  k1: float = BM25_K1, b: float = BM25_B) -> list[dict]:
+        bm25_scores = self.bm25_scores(k1, b)
+        semantic_scores = self.load_semantic_scores(search)
+        results = []
+        for rrf_k in rrf_k_values:
+            metrics = self.evaluate(rrf_scores(bm25_scores, semantic_scores, rrf_k), k)
+            results.append({"rrf_k": rrf_k, **metrics})
+        return results
+
+# end class Evaluator
+
+def ranking_metrics(scores: numpy.ndarray, relevance: numpy.ndarray, k: int,
+                    retrieved: numpy.ndarray | None = None) -> dict:
+    """
+    Returns mean recall@k, MRR and nDCG@k of a queries x documents score array.
+
+    Only documents in the retrieved mask (all documents when it is None) count
+    as hits; the rest are ranked by position only and never retrieved.
+    """
+    ranking = numpy.argsort(-scores, axis=1, kind="stable")
+    ranked_relevance = numpy.take_along_axis(relevance, ranking, axis=1)
+    if retrieved is not None:
+        ranked_relevance = ranked_relevance & numpy.take_along_axis(retrieved, ranking, axis=1)
+    relevant_counts = relevance.sum(axis=1)
+
+    found = ranked_relevance[:, :k].sum(axis=1)
+    recall = numpy.divide(found, relevant_counts, out=numpy.zeros(len(found)),
+                          where=relevant_counts > 0)
+
+    first_relevant = ranked_relevance.argmax(axis=1)
+    reciprocal_rank = numpy.where(ranked_relevance.any(axis=1), 1 / (first_relevant + 1), 0.0)
+
+    discounts = 1 / numpy.log2(numpy.arange(2, k + 2))
+    dcg = (ranked_relevance[:, :k] * discounts[:ranked_relevance[:, :k].shape[1]]).sum(axis=1)
+    ideal_dcg = numpy.concatenate([[0.0], numpy.cumsum(discounts)])[
+        numpy.minimum(relevant_counts, k)]
+    ndcg = numpy.divide(dcg, ideal_dcg, out=numpy.zeros(len(dcg)), where=ideal_dcg > 0)
+
+    return {
+        "recall": float(recall.mean()) if len(recall) else 0.0,
+        "mrr": float(reciprocal_rank.mean()) if len(reciprocal_rank) else 0.0,
+        "ndcg": float(ndcg.mean()) if len(ndcg) else 0.0,
+    }
+
+def load_test_cases(path: str = 'data/golden_dataset.json') -> list[dict]:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Test case file {path} does not exist")
+    with open(path, 'r') as f:
+        return json.load(f)['test_cases']
+
+def load_evaluator(path: str = 'data/golden_dataset.json') -> Evaluator:
+    index = InvertedIndex()
+    index.load()
+    return Evaluator(index, load_test_cases(path))
+
+def print_results(results: list[dict], k: int):
+    results = sorted(results, key=lambda x: x['ndcg'], reverse=True)
+    for result in results:
+        params = ", ".join(f"{name}={value}" for name, value in result.items()
+                           if name not in ("recall", "mrr", "ndcg"))
+        print(f"{params}: recall@{k} {result['recall']:.4f}, "
+              f"mrr {result['mrr']:.4f}, ndcg@{k} {result['ndcg']:.4f}")
+
+def evaluate_command(dataset: str, k: int, k1: float, b: float):
+    evaluator = load_evaluator(dataset)
+    print_results(evaluator.sweep_bm25([k1], [b], k), k)
+
+def sweep_bm25_command(dataset: str, k: int, k1_values: list[float], b_values: list[float]):
+    evaluator = load_evaluator(dataset)
+    print_results(evaluator.sweep_bm25(k1_values, b_values, k), k)
+
+def sweep_hybrid_command(dataset: str, k: int, alpha_values: list[float],
+                         rrf_k_values: list[float]):
+    evaluator = load_evaluator(dataset)
+    search = ChunkedSemanticSearch()
+    search.load_or_create_chunk_embeddings(load_movies())
+
+    if alpha_values:
+        print("Weighted fusion:")
+        print_results(evaluator.sweep_weighted(search, alpha_values, k), k)
+    if rrf_k_values:
+        print("Reciprocal rank fusion:")
+        print_results(evaluator.sweep_rrf(search, rrf_k_values, k), k)
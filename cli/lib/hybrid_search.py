@@ -1,8 +1,10 @@
 import json
 import os
 
+import numpy
+
 from .keyword_search import InvertedIndex
-from .semantic_search import ChunkedSemanticSearch
+from .semantic_search import ChunkedSemanticSearch, load_movies
 
 class HybridSearch:
 
@@ -19,14 +21,38 @@ class HybridSearch:
         self.idx.save()
 
     def _bm25_search(self, query, limit):
-        self.idx.load()
         return self.idx.bm25_search(query, limit)
 
+    def _scores(self, query):
+        doc_ids = self.idx.get_doc_term_matrix().doc_ids
+        bm25_scores = self.idx.bm25_scores(query)
+        query_embed = self.semantic_search.generate_embedding(query)
+        semantic_scores = self.semantic_search.score_documents(query_embed, doc_ids)
+        return doc_ids, bm25_scores, semantic_scores
+
+    def _fused_results(self, doc_ids, fused, bm25_scores, semantic_scores, limit):
+        results: list[dict] = []
+        for row in numpy.argsort(-fused, kind="stable")[:limit]:
+            document = self.idx.get_document(doc_ids[row])
+            results.append({
+                "id": doc_ids[row],
+                "title": document['title'],
+                "description": document['description'][:100],
+                "score": float(fused[row]),
+                "bm25_score": float(bm25_scores[row]),
+                "semantic_score": float(semantic_scores[row]),
+            })
+        return results
+
     def weighted_search(self, query, alpha, limit=5):
-        raise NotImplementedError("Weighted hybrid search is not implemented yet.")
+        doc_ids, bm25_scores, semantic_scores = self._scores(query)
+        fused = weighted_scores(bm25_scores, semantic_scores, alpha)
+        return self._fused_results(doc_ids, fused, bm25_scores, semantic_scores, limit)
 
     def rrf_search(self, query, k, limit=10):
-        raise NotImplementedError("RRF hybrid search is not implemented yet.")
+        doc_ids, bm25_scores, semantic_scores = self._scores(query)
+        fused = rrf_scores(bm25_scores, semantic_scores, k)
+        return self._fused_results(doc_ids, fused, bm25_scores, semantic_scores, limit)
 
 # end class HybridSearch
 
@@ -42,3 +68,56 @@ def normalize_command(scores: list[float]):
     for score in scores:
         normalized = (score - min_score) / (max_score - min_score)
         print(f"* {normalized:.4f}")
+
+def normalize_scores(scores: numpy.ndarray) -> numpy.ndarray:
+    """Min-max normalizes the finite scores; non-finite scores (unscored documents) become 0."""
+    finite = numpy.isfinite(scores)
+    min_score = numpy.where(finite, scores, numpy.inf).min(axis=-1, keepdims=True)
+    max_score = numpy.where(finite, scores, -numpy.inf).max(axis=-1, keepdims=True)
+    spread = max_score - min_score
+    normalized = numpy.divide(
+        scores - min_score, spread, out=numpy.ones_like(scores, dtype=numpy.float64),
+        where=finite & (spread != 0))
+    return numpy.where(finite, normalized, 0.0)
+
+def weighted_scores(bm25_scores: numpy.ndarray, semantic_scores: numpy.ndarray,
+                    alpha: float) -> numpy.ndarray:
+    return (alpha * normalize_scores(bm25_scores)
+            + (1 - alpha) * normalize_scores(semantic_scores))
+
+def rank_positions(scores: numpy.ndarray, retrieved: numpy.ndarray) -> numpy.ndarray:
+    """
+    Returns the 1-based rank of every retrieved score, ties broken by position,
+    and 0 for documents that were not retrieved. Retrieved scores must all be
+    higher than the rest.
+    """
+    order = numpy.argsort(-scores, axis=-1, kind="stable")
+    ranks = numpy.empty_like(order)
+    numpy.put_along_axis(ranks, order, numpy.arange(1, scores.shape[-1] + 1), axis=-1)
+    return numpy.where(retrieved, ranks, 0)
+
+def rrf_scores(bm25_scores: numpy.ndarray, semantic_scores: numpy.ndarray,
+               k: float = 60) -> numpy.ndarray:
+    """
+    Fuses the ranks of documents with a positive BM25 score and of documents
+    with a finite semantic score; unranked documents contribute 0.
+    """
+    fused = numpy.zeros(bm25_scores.shape)
+    for scores, retrieved in ((bm25_scores, bm25_scores > 0),
+                              (semantic_scores, numpy.isfinite(semantic_scores))):
+        ranks = rank_positions(scores, retrieved)
+        fused += numpy.divide(1, k + ranks, out=numpy.zeros(ranks.shape), where=ranks > 0)
+    return fused
+
+def hybrid_search_command(query: str, limit: int, alpha: float | None = None,
+                          k: float | None = None):
+    search = HybridSearch(load_movies())
+    if alpha is not None:
+        results = search.weighted_search(query, alpha, limit)
+    else:
+        results = search.rrf_search(query, k, limit)
+
+    for i, result in enumerate(results):
+        print(f"{i+1}. {result['title']} (score: {result['score']:.4f}, "
+              f"bm25: {result['bm25_score']:.4f}, semantic: {result['semantic_score']:.4f})")
+        print(f"   {result['description']}...")
@@ -4,11 +4,14 @@ import os
 import pickle
 import re
 import string
+import threading
 
+import numpy
 from nltk.stem import PorterStemmer
 
 BM25_K1 = 1.5
 BM25_B = 0.75
+POSTING_CACHE_BYTES = 16 * 1024 * 1024
 
 class InvertedIndex:
 
@@ -21,6 +24,14 @@ class InvertedIndex:
         self.term_frequencies = {}
         # dictionary mapping document ids to lengths
         self.doc_lengths = {}
+        # sparse document-term matrix, saved with the index or built on first use
+        self.doc_term_matrix = None
+        # dictionary mapping tokens to bm25 idf, computed at build time
+        self.bm25_idf = {}
+        # decoded postings of recently queried tokens
+        self.posting_cache = PostingCache()
+        # (b, per-row bm25 length norms) of the most recent b
+        self.length_norms = None
 
     def __get_avg_doc_length(self) -> float:
         if not self.doc_lengths or len(self.doc_lengths) == 0:
@@ -70,14 +81,19 @@ class InvertedIndex:
         term_doc_count = len(self.index[token])
         return doc_count, term_doc_count
 
+    def __compute_bm25_idf(self):
+        n = len(self.docmap)
+        self.bm25_idf = {}
+        for token, doc_ids in self.index.items():
+            df = len(doc_ids)
+            self.bm25_idf[token] = math.log((n - df + 0.5) / (df + 0.5) + 1)
+
     def get_bm25_idf(self, term: str) -> float:
         token = tokenize_one(term)
 
-        n = len(self.docmap)
-        if token not in self.index:
+        if token not in self.bm25_idf:
             raise Exception("token not in index")
-        df = len(self.index[token])
-        return math.log((n - df + 0.5) / (df + 0.5) + 1)
+        return self.bm25_idf[token]
 
     def get_bm25_tf(self, doc_id: int, term: str, k1: float = BM25_K1, b: float = BM25_B) -> float:
         token = tokenize_one(term)
@@ -104,16 +120,77 @@ class InvertedIndex:
         bm25_idf = self.get_bm25_idf(token)
         return bm25_tf * bm25_idf
 
-    def bm25_search(self, query, limit):
-        tokens = tokenize(query)
-
-        scores = []
-        for doc_id, document in self.docmap.items():
-            doc_score = 0.0
-            for token in tokens:
-                doc_score += self.get_bm25(doc_id, token)
-            scores.append((doc_id, document['title'], doc_score))
-        return sorted(scores, key=lambda x: x[2], reverse=True)[:limit]
+    def get_doc_term_matrix(self) -> "DocTermMatrix":
+        if self.doc_term_matrix is None:
+            self.doc_term_matrix = DocTermMatrix.from_index(self)
+        return self.doc_term_matrix
+
+    def get_tfs(self, doc_ids: list[int], terms: list[str]) -> numpy.ndarray:
+        matrix = self.get_doc_term_matrix()
+        tokens = [tokenize_one(term) for term in terms]
+        return matrix.dense(matrix.tf, doc_ids, tokens)
+
+    def get_tfidfs(self, doc_ids: list[int], terms: list[str]) -> numpy.ndarray:
+        matrix = self.get_doc_term_matrix()
+        tokens = [tokenize_one(term) for term in terms]
+        return matrix.dense(matrix.tfidf_weights(), doc_ids, tokens)
+
+    def get_idfs(self, terms: list[str]) -> numpy.ndarray:
+        matrix = self.get_doc_term_matrix()
+        return matrix.idf()[self.__get_columns(terms)]
+
+    def get_bm25_idfs(self, terms: list[str]) -> numpy.ndarray:
+        matrix = self.get_doc_term_matrix()
+        return matrix.bm25_idf()[self.__get_columns(terms)]
+
+    def get_bm25_tfs(self, doc_ids: list[int], terms: list[str],
+                     k1: float = BM25_K1, b: float = BM25_B) -> numpy.ndarray:
+        matrix = self.get_doc_term_matrix()
+        tokens = [tokenize_one(term) for term in terms]
+        return matrix.dense(matrix.bm25_tf_weights(k1, b), doc_ids, tokens)
+
+    def __get_columns(self, terms: list[str]) -> list[int]:
+        vocabulary = self.get_doc_term_matrix().vocabulary
+        columns = []
+        for term in terms:
+            token = tokenize_one(term)
+            if token not in vocabulary:
+                raise Exception("token not in index")
+            columns.append(vocabulary[token])
+        return columns
+
+    def __get_length_norms(self, b: float) -> numpy.ndarray:
+        length_norms = self.length_norms
+        if length_norms is None or length_norms[0] != b:
+            length_norms = (b, self.get_doc_term_matrix().length_norms(b))
+            self.length_norms = length_norms
+        return length_norms[1]
+
+    def get_postings(self, token: str, k1: float = BM25_K1, b: float = BM25_B):
+        """Returns (matrix rows, bm25 weights) of the documents containing token, or None."""
+        matrix = self.get_doc_term_matrix()
+        if token not in matrix.vocabulary:
+            return None
+
+        key = (token, k1, b)
+        postings = self.posting_cache.get(key)
+        if postings is not None:
+            return postings
+
+        rows, weights = matrix.bm25_postings(token, self.__get_length_norms(b), k1)
+        postings = (rows, weights)
+        self.posting_cache.put(key, postings)
+        return postings
+
+    def bm25_scores(self, query: str, k1: float = BM25_K1, b: float = BM25_B) -> numpy.ndarray:
+        """Returns the bm25 score of every document, in doc term matrix row order."""
+        matrix = self.get_doc_term_matrix()
+        return accumulate_postings(
+            len(matrix.doc_ids), tokenize(query), lambda token: self.get_postings(token, k1, b))
+
+    def bm25_search(self, query, limit, k1: float = BM25_K1, b: float = BM25_B):
+        matrix = self.get_doc_term_matrix()
+        return top_documents(matrix.doc_ids, self.docmap, self.bm25_scores(query, k1, b), limit)
 
     def build(self, movies):
         for movie in movies:
@@ -121,6 +198,10 @@ class InvertedIndex:
             text = f"{movie['title']} {movie['description']}"
             self.__add_document(doc_id, text)
             self.docmap[doc_id] = movie
+        self.__compute_bm25_idf()
+        self.doc_term_matrix = None
+        self.length_norms = None
+        self.posting_cache.clear()
 
     def save(self):
         os.makedirs('cache', exist_ok=True)
@@ -132,6 +213,9 @@ class InvertedIndex:
             pickle.dump(self.term_frequencies, f)
         with open('cache/doc_lengths.pkl', 'wb') as f:
             pickle.dump(self.doc_lengths, f)
+        with open('cache/bm25_idf.pkl', 'wb') as f:
+            pickle.dump(self.bm25_idf, f)
+        self.get_doc_term_matrix().save('cache/doc_term_matrix.npz')
 
     def load(self):
         if not os.path.exists('cache'):
@@ -153,9 +237,269 @@ class InvertedIndex:
             self.term_frequencies = pickle.load(f)
         with open('cache/doc_lengths.pkl', 'rb') as f:
             self.doc_lengths = pickle.load(f)
+        # caches saved before the idf table was persisted derive it from the index
+        if os.path.exists('cache/bm25_idf.pkl'):
+            with open('cache/bm25_idf.pkl', 'rb') as f:
+                self.bm25_idf = pickle.load(f)
+        else:
+            self.__compute_bm25_idf()
+
+        # caches saved before the matrix was persisted build it on first use
+        self.doc_term_matrix = None
+        if os.path.exists('cache/doc_term_matrix.npz'):
+            matrix = DocTermMatrix.load('cache/doc_term_matrix.npz')
+            if (matrix.doc_ids == list(self.docmap.keys())
+                and matrix.vocabulary.keys() == self.index.keys()):
+                self.doc_term_matrix = matrix
+        self.length_norms = None
+        self.posting_cache.clear()
 
 # end class InvertedIndex
 
+class DocTermMatrix:
+    """
+    Sparse document-term matrix in CSR layout.
+
+    Row i holds document doc_ids[i]; its entries are stored in
+    indices[indptr[i]:indptr[i+1]] (columns, sorted) and the matching slice
+    of any weight array (tf, bm25_weights(...), ...), so a query is scored
+    as a sparse dot product with no Python loop over documents.
+    """
+
+    def __init__(self, doc_ids, vocabulary, indptr, indices, tf, doc_lengths, doc_freqs,
+                 bm25_idf_table):
+        # list of document ids, one per row
+        self.doc_ids = doc_ids
+        # dictionary mapping document ids to rows
+        self.doc_rows = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        # dictionary mapping tokens to columns
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        # raw term frequency of every stored entry
+        self.tf = tf
+        # token count per row
+        self.doc_lengths = doc_lengths
+        # number of documents containing each column's token
+        self.doc_freqs = doc_freqs
+        # bm25 idf of each column's token, taken from InvertedIndex.bm25_idf
+        self.bm25_idf_table = bm25_idf_table
+        # row of every stored entry, used to sum entry scores per document
+        self.rows = numpy.repeat(numpy.arange(len(doc_ids)), numpy.diff(indptr))
+        # column-major layout: column c's entries are
+        # column_entries[column_indptr[c]:column_indptr[c+1]], in row order
+        self.column_indptr = numpy.zeros(len(vocabulary) + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(indices, minlength=len(vocabulary)),
+                     out=self.column_indptr[1:])
+        self.column_entries = numpy.argsort(indices, kind="stable")
+        self.column_rows = self.rows[self.column_entries]
+
+    @classmethod
+    def from_index(cls, index: InvertedIndex) -> "DocTermMatrix":
+        doc_ids = list(index.docmap.keys())
+        vocabulary = {token: i for i, token in enumerate(sorted(index.index.keys()))}
+
+        indptr = numpy.zeros(len(doc_ids) + 1, dtype=numpy.int64)
+        indices = []
+        tf = []
+        for i, doc_id in enumerate(doc_ids):
+            counts = index.term_frequencies.get(doc_id, {})
+            columns = sorted((vocabulary[token], count) for token, count in counts.items())
+            indices.extend(column for column, _ in columns)
+            tf.extend(count for _, count in columns)
+            indptr[i + 1] = len(indices)
+
+        doc_lengths = numpy.array(
+            [index.doc_lengths.get(doc_id, 0) for doc_id in doc_ids], dtype=numpy.float64)
+        doc_freqs = numpy.zeros(len(vocabulary), dtype=numpy.int64)
+        bm25_idf_table = numpy.zeros(len(vocabulary), dtype=numpy.float64)
+        for token, column in vocabulary.items():
+            doc_freqs[column] = len(index.index[token])
+            bm25_idf_table[column] = index.bm25_idf[token]
+
+        return cls(doc_ids, vocabulary, indptr,
+                   numpy.array(indices, dtype=numpy.int64),
+                   numpy.array(tf, dtype=numpy.float64),
+                   doc_lengths, doc_freqs, bm25_idf_table)
+
+    def save(self, path: str):
+        tokens = sorted(self.vocabulary, key=self.vocabulary.get)
+        numpy.savez(path,
+                    doc_ids=numpy.array(self.doc_ids, dtype=numpy.int64),
+                    vocabulary=numpy.array(tokens, dtype=str),
+                    indptr=self.indptr,
+                    indices=self.indices,
+                    tf=self.tf,
+                    doc_lengths=self.doc_lengths,
+                    doc_freqs=self.doc_freqs,
+                    bm25_idf_table=self.bm25_idf_table)
+
+    @classmethod
+    def load(cls, path: str) -> "DocTermMatrix":
+        with numpy.load(path) as data:
+            vocabulary = {str(token): i for i, token in enumerate(data['vocabulary'])}
+            return cls(data['doc_ids'].tolist(), vocabulary, data['indptr'], data['indices'],
+                       data['tf'], data['doc_lengths'], data['doc_freqs'],
+                       data['bm25_idf_table'])
+
+    def copy(self) -> "DocTermMatrix":
+        return DocTermMatrix(list(self.doc_ids), dict(self.vocabulary), self.indptr.copy(),
+                             self.indices.copy(), self.tf.copy(), self.doc_lengths.copy(),
+                             self.doc_freqs.copy(), self.bm25_idf_table.copy())
+
+    def length_norms(self, b: float = BM25_B) -> numpy.ndarray:
+        avg_doc_length = self.doc_lengths.mean() if len(self.doc_lengths) > 0 else 0.0
+        if avg_doc_length <= 0:
+            return numpy.ones_like(self.doc_lengths)
+        return 1 - b + b * (self.doc_lengths / avg_doc_length)
+
+    def idf(self) -> numpy.ndarray:
+        n = len(self.doc_ids)
+        return numpy.log((n + 1) / (self.doc_freqs + 1))
+
+    def bm25_idf(self) -> numpy.ndarray:
+        return self.bm25_idf_table
+
+    def tfidf_weights(self) -> numpy.ndarray:
+        return self.tf * self.idf()[self.indices]
+
+    def bm25_tf_weights(self, k1: float = BM25_K1, b: float = BM25_B) -> numpy.ndarray:
+        norms = self.length_norms(b)[self.rows]
+        return (self.tf * (k1 + 1)) / (self.tf + k1 * norms)
+
+    def bm25_weights(self, k1: float = BM25_K1, b: float = BM25_B) -> numpy.ndarray:
+        return self.bm25_tf_weights(k1, b) * self.bm25_idf()[self.indices]
+
+    def bm25_postings(self, token: str, norms: numpy.ndarray, k1: float = BM25_K1):
+        """
+        Returns (rows, bm25 weights) of the documents containing token, or None,
+        given the per-row length norms of the b to score with.
+        """
+        column = self.vocabulary.get(token)
+        if column is None:
+            return None
+        start, end = self.column_indptr[column], self.column_indptr[column + 1]
+        rows = self.column_rows[start:end]
+        tf = self.tf[self.column_entries[start:end]]
+        weights = (tf * (k1 + 1)) / (tf + k1 * norms[rows]) * self.bm25_idf_table[column]
+        rows.setflags(write=False)
+        weights.setflags(write=False)
+        return rows, weights
+
+    def query_vector(self, tokens: list[str]) -> numpy.ndarray:
+        query = numpy.zeros(len(self.vocabulary), dtype=numpy.float64)
+        for token in tokens:
+            if token in self.vocabulary:
+                query[self.vocabulary[token]] += 1
+        return query
+
+    def score(self, tokens: list[str], weights: numpy.ndarray) -> numpy.ndarray:
+        query = self.query_vector(tokens)
+        return numpy.bincount(
+            self.rows, weights=weights * query[self.indices], minlength=len(self.doc_ids))
+
+    def dense(self, weights: numpy.ndarray, doc_ids: list[int], tokens: list[str]) -> numpy.ndarray:
+        """Returns a len(doc_ids) x len(tokens) array of weights, zero where a token is absent."""
+        unique_tokens = list(dict.fromkeys(tokens))
+        positions = numpy.full(len(self.vocabulary), -1, dtype=numpy.int64)
+        for j, token in enumerate(unique_tokens):
+            if token in self.vocabulary:
+                positions[self.vocabulary[token]] = j
+
+        result = numpy.zeros((len(doc_ids), len(unique_tokens)), dtype=numpy.float64)
+        for i, doc_id in enumerate(doc_ids):
+            if doc_id not in self.doc_rows:
+                raise Exception(f"document {doc_id} not in index")
+            row = self.doc_rows[doc_id]
+            start, end = self.indptr[row], self.indptr[row + 1]
+            columns = positions[self.indices[start:end]]
+            found = columns >= 0
+            result[i, columns[found]] = weights[start:end][found]
+        return result[:, [unique_tokens.index(token) for token in tokens]]
+
+# end class DocTermMatrix
+
+class PostingCache:
+    """
+    LRU cache of decoded postings, bounded by the total bytes of their arrays.
+
+    Entries are tuples of NumPy arrays; the least recently used entries are
+    evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, max_bytes: int = POSTING_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, arrays: tuple):
+        nbytes = sum(array.nbytes for array in arrays)
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= sum(array.nbytes for array in self.entries.pop(key))
+            self.entries[key] = arrays
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(array.nbytes for array in evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hit_rate(),
+            }
+
+# end class PostingCache
+
+def accumulate_postings(doc_count: int, tokens: list[str], get_postings) -> numpy.ndarray:
+    """Sums the (rows, weights) postings of every token, touching only those rows."""
+    scores = numpy.zeros(doc_count)
+    for token in tokens:
+        postings = get_postings(token)
+        if postings is None:
+            continue
+        rows, weights = postings
+        # rows are unique within one token's postings
+        scores[rows] += weights
+    return scores
+
+def top_documents(doc_ids, docmap, scores: numpy.ndarray, limit: int):
+    results = []
+    for row in numpy.argsort(-scores, kind="stable")[:limit]:
+        doc_id = doc_ids[row]
+        results.append((doc_id, docmap[doc_id]['title'], float(scores[row])))
+    return results
+
 def tokenize(text: str) -> list[str]:
     stemmer = PorterStemmer()
 
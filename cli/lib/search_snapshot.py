@@ -0,0 +1,233 @@
+import concurrent.futures
+import threading
+import types
+
+import numpy
+
+from .keyword_search import (BM25_B, BM25_K1, DocTermMatrix, InvertedIndex, PostingCache,
+                             accumulate_postings, tokenize, top_documents)
+from .semantic_search import ChunkedSemanticSearch, load_movies
+
+class SearchSnapshot:
+    """
+    Read-only view of a built InvertedIndex and, optionally, chunk embeddings.
+
+    Every array is frozen and nothing but the internally locked posting cache
+    changes after __init__, so a snapshot can be queried from many threads at
+    once. To pick up a rebuilt index, build a new snapshot and publish it to a
+    SearchService; never mutate this one. Candidate chunk search needs the
+    snapshot to be built with_centroids.
+    """
+
+    def __init__(self, index: InvertedIndex, chunked_search: ChunkedSemanticSearch | None = None,
+                 k1: float = BM25_K1, b: float = BM25_B, with_centroids: bool = False):
+        # a private copy, so the snapshot never shares state with the live index
+        self.matrix = frozen_matrix(index.get_doc_term_matrix().copy())
+        self.k1 = k1
+        self.length_norms = frozen(self.matrix.length_norms(b))
+        # decoded postings of hot query terms, shared by every query on this snapshot
+        self.posting_cache = PostingCache()
+        self.docmap = types.MappingProxyType(
+            {doc_id: types.MappingProxyType(dict(document))
+             for doc_id, document in index.docmap.items()})
+
+        self.model = None
+        self.chunk_embeddings = None
+        self.chunk_rows = None
+        self.chunk_metadata = ()
+        self.centroids = None
+        self.centroid_chunks = ()
+        if chunked_search is not None:
+            self.model = chunked_search.model
+            embeddings = numpy.asarray(chunked_search.chunk_embeddings, dtype=numpy.float32)
+            norms = numpy.linalg.norm(embeddings, axis=1, keepdims=True)
+            self.chunk_embeddings = frozen(numpy.divide(
+                embeddings, norms, out=numpy.zeros_like(embeddings), where=norms != 0))
+            self.chunk_rows = frozen(numpy.array(
+                [self.matrix.doc_rows.get(metadata['movie_idx'], -1)
+                 for metadata in chunked_search.chunk_metadata], dtype=numpy.int64))
+            self.chunk_metadata = tuple(
+                types.MappingProxyType(dict(metadata))
+                for metadata in chunked_search.chunk_metadata)
+
+        if chunked_search is not None and with_centroids:
+            centroids = numpy.asarray(chunked_search.load_or_create_centroids(),
+                                      dtype=numpy.float32)
+            norms = numpy.linalg.norm(centroids, axis=1, keepdims=True)
+            self.centroids = frozen(numpy.divide(
+                centroids, norms, out=numpy.zeros_like(centroids), where=norms != 0))
+            self.centroid_chunks = tuple(
+                frozen(chunks.copy()) for chunks in chunked_search.doc_chunks)
+
+    def get_postings(self, token: str):
+        if token not in self.matrix.vocabulary:
+            return None
+
+        postings = self.posting_cache.get(token)
+        if postings is None:
+            postings = self.matrix.bm25_postings(token, self.length_norms, self.k1)
+            self.posting_cache.put(token, postings)
+        return postings
+
+    def bm25_search(self, query: str, limit: int):
+        scores = accumulate_postings(len(self.matrix.doc_ids), tokenize(query), self.get_postings)
+        return top_documents(self.matrix.doc_ids, self.docmap, scores, limit)
+
+    def search_chunks(self, query: str, limit: int = 10,
+                      candidate_multiplier: int | None = None) -> list[dict]:
+        """
+        Max-pools chunk similarities per document. With candidate_multiplier,
+        only the chunks of the limit * candidate_multiplier documents closest
+        by centroid are scored.
+        """
+        if self.chunk_embeddings is None:
+            raise ValueError("Snapshot has no chunk embeddings.")
+        if len(query) == 0 or not query.strip():
+            raise ValueError("Input text is empty or contains only whitespace.")
+        if candidate_multiplier is not None and candidate_multiplier < 1:
+            raise ValueError("Candidate multiplier must be at least 1.")
+        if candidate_multiplier is not None and self.centroids is None:
+            raise ValueError("Snapshot has no centroids. Build it with `with_centroids=True`.")
+
+        query_embed = self.model.encode(sentences=query)
+        query_norm = numpy.linalg.norm(query_embed)
+        if query_norm != 0:
+            query_embed = query_embed / query_norm
+
+        if candidate_multiplier is None:
+            chunk_ids = numpy.arange(len(self.chunk_embeddings))
+            similarities = self.chunk_embeddings @ query_embed
+        else:
+            n_candidates = min(limit * candidate_multiplier, len(self.centroids))
+            if n_candidates <= 0:
+                return []
+            centroid_scores = self.centroids @ query_embed
+            candidates = numpy.argpartition(-centroid_scores, n_candidates - 1)[:n_candidates]
+            chunk_ids = numpy.concatenate([self.centroid_chunks[i] for i in candidates])
+            similarities = self.chunk_embeddings[chunk_ids] @ query_embed
+        chunk_rows = self.chunk_rows[chunk_ids]
+
+        known = chunk_rows >= 0
+        scores = numpy.full(len(self.matrix.doc_ids), -numpy.inf)
+        numpy.maximum.at(scores, chunk_rows[known], similarities[known])
+
+        results: list[dict] = []
+        for row in numpy.argsort(-scores, kind="stable")[:limit]:
+            if numpy.isinf(scores[row]):
+                break
+            doc_id = self.matrix.doc_ids[row]
+            document = self.docmap[doc_id]
+            chunks = numpy.flatnonzero(chunk_rows == row)
+            best_chunk = chunk_ids[chunks[similarities[chunks].argmax()]]
+            results.append({
+                "id": doc_id,
+                "title": document['title'],
+                "description": document['description'][:100],
+                "score": float(scores[row]),
+                "metadata": self.chunk_metadata[best_chunk],
+            })
+        return results
+
+# end class SearchSnapshot
+
+class SearchService:
+    """
+    Serves queries from the current SearchSnapshot on a thread pool.
+
+    publish() swaps the snapshot atomically; queries already running keep the
+    snapshot they started with, and new queries see the published one.
+    """
+
+    def __init__(self, snapshot: SearchSnapshot | None = None, max_workers: int | None = None):
+        self.lock = threading.Lock()
+        self.current = snapshot
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def snapshot(self) -> SearchSnapshot:
+        with self.lock:
+            if self.current is None:
+                raise ValueError("No snapshot published. Call `publish` first.")
+            return self.current
+
+    def publish(self, snapshot: SearchSnapshot) -> SearchSnapshot | None:
+        with self.lock:
+            previous = self.current
+            self.current = snapshot
+        return previous
+
+    def bm25_search(self, query: str, limit: int):
+        return self.snapshot().bm25_search(query, limit)
+
+    def search_chunks(self, query: str, limit: int = 10,
+                      candidate_multiplier: int | None = None) -> list[dict]:
+        return self.snapshot().search_chunks(query, limit, candidate_multiplier)
+
+    def search_many(self, queries: list[str], limit: int, mode: str = "bm25",
+                    candidate_multiplier: int | None = None) -> list:
+        # pin one snapshot so every query in the batch sees the same index
+        snapshot = self.snapshot()
+        match mode:
+            case "bm25":
+                search = snapshot.bm25_search
+            case "chunked":
+                def search(query, limit):
+                    return snapshot.search_chunks(query, limit, candidate_multiplier)
+            case _:
+                raise ValueError(f"Unknown search mode '{mode}'")
+        return list(self.executor.map(lambda query: search(query, limit), queries))
+
+    def close(self):
+        self.executor.shutdown()
+
+# end class SearchService
+
+def frozen(array: numpy.ndarray) -> numpy.ndarray:
+    array.setflags(write=False)
+    return array
+
+def frozen_matrix(matrix: DocTermMatrix) -> DocTermMatrix:
+    """Makes a DocTermMatrix the caller owns read-only, in place."""
+    matrix.doc_ids = tuple(matrix.doc_ids)
+    matrix.doc_rows = types.MappingProxyType(matrix.doc_rows)
+    matrix.vocabulary = types.MappingProxyType(matrix.vocabulary)
+    for array in (matrix.indptr, matrix.indices, matrix.tf,
+                  matrix.doc_lengths, matrix.doc_freqs, matrix.bm25_idf_table, matrix.rows,
+                  matrix.column_indptr, matrix.column_entries, matrix.column_rows):
+        frozen(array)
+    return matrix
+
+def load_snapshot(with_chunks: bool = True, with_centroids: bool = False) -> SearchSnapshot:
+    index = InvertedIndex()
+    index.load()
+
+    chunked_search = None
+    if with_chunks:
+        chunked_search = ChunkedSemanticSearch()
+        chunked_search.load_or_create_chunk_embeddings(load_movies())
+    return SearchSnapshot(index, chunked_search, with_centroids=with_chunks and with_centroids)
+
+def batch_search_command(queries: list[str], limit: int, mode: str, workers: int,
+                         candidate_multiplier: int | None = None):
+    snapshot = load_snapshot(with_chunks=mode == "chunked",
+                             with_centroids=candidate_multiplier is not None)
+    service = SearchService(snapshot, max_workers=workers)
+    try:
+        results = service.search_many(queries, limit, mode, candidate_multiplier)
+    finally:
+        service.close()
+
+    for query, query_results in zip(queries, results):
+        print(f"Query: {query}")
+        for i, result in enumerate(query_results):
+            if mode == "bm25":
+                doc_id, title, score = result
+            else:
+                doc_id, title, score = result['id'], result['title'], result['score']
+            print(f"{i+1}. ({doc_id:4}) {title} - Score: {score:.4f}")
+        print()
+
+    if mode == "bm25":
+        stats = snapshot.posting_cache.stats()
+        print(f"Posting cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.1%}), {stats['entries']} terms, "
+              f"{stats['bytes']} bytes, {stats['evictions']} evictions")
@@ -3,6 +3,7 @@
 import json
 import os
 import re
+import threading
 
 import numpy
 import sentence_transformers
@@ -113,6 +114,11 @@ def cosine_similarity(vec1, vec2):
 
     return dot_product / (norm1 * norm2)
 
+def cosine_similarities(matrix, vec):
+    matrix = numpy.asarray(matrix)
+    norms = numpy.linalg.norm(matrix, axis=1) * numpy.linalg.norm(vec)
+    return numpy.divide(matrix @ vec, norms, out=numpy.zeros(len(matrix)), where=norms != 0)
+
 def search_command(query: str, limit: int):
     search = SemanticSearch()
 
@@ -182,6 +188,15 @@ class ChunkedSemanticSearch(SemanticSearch):
         super().__init__()
         self.chunk_embeddings = []
         self.chunk_metadata = []
+        # ids of the documents that have chunks
+        self.chunk_doc_ids = []
+        # chunk indices of each chunk_doc_ids entry
+        self.doc_chunks = []
+        # chunk_doc_ids position of every chunk
+        self.chunk_docs = numpy.zeros(0, dtype=numpy.int64)
+        # mean-pooled chunk embedding per chunk_doc_ids entry, loaded on first candidate search
+        self.centroids = None
+        self.centroid_lock = threading.Lock()
 
     def build_chunk_embeddings(self, documents):
         self.documents = documents
@@ -211,6 +226,9 @@ class ChunkedSemanticSearch(SemanticSearch):
         with open('cache/chunk_metadata.json', 'w') as f:
             json.dump({"chunks": metadata, "total_chunks": len(chunks)}, f, indent=2)
 
+        self.__group_chunks()
+        # centroids are cheap next to encoding, so write them with the embeddings
+        self.build_centroids()
         return self.chunk_embeddings
 
     def load_or_create_chunk_embeddings(self, documents: list[dict]):
@@ -224,60 +242,165 @@ class ChunkedSemanticSearch(SemanticSearch):
                 self.chunk_embeddings = numpy.load(f)
             with open('cache/chunk_metadata.json', 'r') as f:
                 self.chunk_metadata = json.load(f)['chunks']
+            self.__group_chunks()
+            self.centroids = None
             return self.chunk_embeddings
 
         return self.build_chunk_embeddings(documents)
 
-    def search_chunks(self, query: str, limit: int = 10):
-        movies = []
-        if os.path.exists('data/movies.json'):
-            with open('data/movies.json', 'r') as f:
-                movies = json.load(f)["movies"]
-        self.load_or_create_chunk_embeddings(movies)
+    def __group_chunks(self):
+        groups: dict[int, list[int]] = {}
+        for i, metadata in enumerate(self.chunk_metadata):
+            groups.setdefault(metadata['movie_idx'], []).append(i)
+
+        chunk_docs = numpy.zeros(len(self.chunk_metadata), dtype=numpy.int64)
+        doc_chunks = []
+        for i, chunks in enumerate(groups.values()):
+            doc_chunks.append(numpy.array(chunks, dtype=numpy.int64))
+            chunk_docs[chunks] = i
+
+        self.chunk_doc_ids = list(groups.keys())
+        self.doc_chunks = doc_chunks
+        self.chunk_docs = chunk_docs
+
+    def __chunk_fingerprint(self) -> dict:
+        """Identifies the cached chunk embeddings and metadata that centroids are built from."""
+        fingerprint = {"embeddings_shape": list(numpy.shape(self.chunk_embeddings))}
+        for name in ('cache/chunk_embeddings.npy', 'cache/chunk_metadata.json'):
+            stat = os.stat(name)
+            fingerprint[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return fingerprint
+
+    def build_centroids(self):
+        embeddings = numpy.asarray(self.chunk_embeddings, dtype=numpy.float32)
+        dimensions = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        centroids = numpy.zeros((len(self.chunk_doc_ids), dimensions), dtype=numpy.float32)
+        if len(self.chunk_docs) > 0:
+            numpy.add.at(centroids, self.chunk_docs, embeddings)
+            centroids /= numpy.bincount(self.chunk_docs, minlength=len(centroids))[:, None]
+
+        with open('cache/chunk_centroids.npy', 'wb') as f:
+            numpy.save(f, centroids)
+        with open('cache/chunk_centroids.json', 'w') as f:
+            json.dump(self.__chunk_fingerprint(), f, indent=2)
+
+        self.centroids = centroids
+        return self.centroids
+
+    def load_or_create_centroids(self):
+        # centroids is assigned once, under the lock, so concurrent readers see
+        # either None or the finished array
+        centroids = self.centroids
+        if centroids is not None:
+            return centroids
+
+        with self.centroid_lock:
+            if self.centroids is not None:
+                return self.centroids
+
+            if (os.path.exists('cache/chunk_centroids.npy')
+                and os.path.exists('cache/chunk_centroids.json')):
+                with open('cache/chunk_centroids.json', 'r') as f:
+                    fingerprint = json.load(f)
+                with open('cache/chunk_centroids.npy', 'rb') as f:
+                    centroids = numpy.load(f)
+
+                embeddings_shape = numpy.shape(self.chunk_embeddings)
+                dimensions = embeddings_shape[1] if len(embeddings_shape) == 2 else 0
+                if (fingerprint == self.__chunk_fingerprint()
+                    and centroids.shape == (len(self.chunk_doc_ids), dimensions)):
+                    self.centroids = centroids
+                    return self.centroids
+
+            return self.build_centroids()
+
+    def search_chunks(self, query: str, limit: int = 10, candidate_multiplier: int | None = None):
+        if len(self.chunk_embeddings) == 0:
+            raise ValueError(
+                "No chunk embeddings loaded. Call `load_or_create_chunk_embeddings` first.")
+
+        if candidate_multiplier is not None:
+            return self.__search_candidate_chunks(query, limit, candidate_multiplier)
 
         query_embed = self.generate_embedding(query)
+        similarities = cosine_similarities(self.chunk_embeddings, query_embed)
 
-        chunk_scores: list[dict] = []
-        for i, chunk_embed in enumerate(self.chunk_embeddings):
-            metadata = self.chunk_metadata[i]
-            score = cosine_similarity(query_embed, chunk_embed)
-            chunk_scores.append({
-                "chunk_idx": metadata['chunk_idx'],
-                "movie_idx": metadata['movie_idx'],
-                "score": score,
-            })
+        doc_scores = numpy.full(len(self.chunk_doc_ids), -numpy.inf)
+        numpy.maximum.at(doc_scores, self.chunk_docs, similarities)
+
+        return self.__chunk_results(
+            numpy.arange(len(self.chunk_doc_ids)), doc_scores, similarities, limit)
+
+    def score_documents(self, query_embed, doc_ids: list[int]) -> numpy.ndarray:
+        """Returns the best chunk cosine similarity of each document, -inf if it has no chunks."""
+        similarities = cosine_similarities(self.chunk_embeddings, query_embed)
+
+        rows = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        chunk_rows = numpy.array(
+            [rows.get(metadata['movie_idx'], -1) for metadata in self.chunk_metadata],
+            dtype=numpy.int64)
+        known = chunk_rows >= 0
+
+        scores = numpy.full(len(doc_ids), -numpy.inf)
+        numpy.maximum.at(scores, chunk_rows[known], similarities[known])
+        return scores
+
+    def __search_candidate_chunks(self, query: str, limit: int, candidate_multiplier: int):
+        """
+        Picks limit * candidate_multiplier documents by centroid similarity,
+        then max-pools the exact chunk scores of those documents only.
+        """
+        if candidate_multiplier < 1:
+            raise ValueError("Candidate multiplier must be at least 1.")
+
+        centroids = self.load_or_create_centroids()
+        query_embed = self.generate_embedding(query)
+
+        centroid_scores = cosine_similarities(centroids, query_embed)
+        n_candidates = min(limit * candidate_multiplier, len(self.chunk_doc_ids))
+        if n_candidates <= 0:
+            return []
+        candidates = numpy.argpartition(-centroid_scores, n_candidates - 1)[:n_candidates]
+
+        candidate_chunks = [self.doc_chunks[candidate] for candidate in candidates]
+        starts = numpy.cumsum([0] + [len(chunks) for chunks in candidate_chunks[:-1]])
+        chunk_ids = numpy.concatenate(candidate_chunks)
+
+        # only candidate chunks are scored; the rest stay -inf
+        similarities = numpy.full(len(self.chunk_embeddings), -numpy.inf)
+        similarities[chunk_ids] = cosine_similarities(
+            numpy.asarray(self.chunk_embeddings)[chunk_ids], query_embed)
+        doc_scores = numpy.maximum.reduceat(similarities[chunk_ids], starts)
 
-        movie_scores: dict[int, float] = {}
-        for chunk_score in chunk_scores:
-            movie_idx: int = chunk_score['movie_idx']
-            score: float = chunk_score['score']
-            if movie_idx not in movie_scores or score > movie_scores[movie_idx]:
-                movie_scores[movie_idx] = score
+        return self.__chunk_results(candidates, doc_scores, similarities, limit)
 
-        sorted_scores = sorted(movie_scores.items(), key=lambda kv: kv[1], reverse=True)
+    def __chunk_results(self, docs, doc_scores, similarities, limit: int) -> list[dict]:
+        """Builds results for the best `limit` docs (chunk_doc_ids positions) by doc_scores."""
         results: list[dict] = []
-        for movie_score in sorted_scores[:limit]:
-            doc_id = movie_score[0]
+        for i in numpy.argsort(-doc_scores, kind="stable")[:limit]:
+            doc_id = self.chunk_doc_ids[docs[i]]
             document = self.document_map[doc_id]
+            chunks = self.doc_chunks[docs[i]]
+            best_chunk = chunks[similarities[chunks].argmax()]
             results.append({
                 "id": doc_id,
                 "title": document['title'],
                 "description": document['description'][:100],
-                "score": movie_score[1],
-                "metadata": self.chunk_metadata[doc_id],
+                "score": float(doc_scores[i]),
+                "metadata": self.chunk_metadata[best_chunk],
             })
 
         return results
 
 # end class ChunkedSemanticSearch
 
-def search_chunked_command(query: str, limit: int):
+def search_chunked_command(query: str, limit: int, candidate_multiplier: int | None = None):
     search = ChunkedSemanticSearch()
 
     movies = load_movies()
     search.load_or_create_chunk_embeddings(movies)
 
-    results: list[dict] = search.search_chunks(query, limit)
+    results: list[dict] = search.search_chunks(query, limit, candidate_multiplier)
     for i, result in enumerate(results):
         title = result['title']
         score = result['score']
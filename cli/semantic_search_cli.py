@@ -28,6 +28,9 @@ def main():
     search_chunked_parser = subparsers.add_parser("search_chunked", help="search chunked")
     search_chunked_parser.add_argument("query", help="query text")
     search_chunked_parser.add_argument("--limit", type=int, default=5, help="results limit")
+    search_chunked_parser.add_argument(
+        "--candidate-multiplier", type=int, default=None,
+        help="score chunks of only limit * multiplier documents picked by centroid similarity")
 
     args = parser.parse_args()
     match args.command:
@@ -56,7 +59,10 @@ def main():
             semantic_search.embed_chunks_command()
 
         case "search_chunked":
-            semantic_search.search_chunked_command(args.query, args.limit)
+            if args.candidate_multiplier is not None and args.candidate_multiplier < 1:
+                parser.error("--candidate-multiplier must be at least 1")
+            semantic_search.search_chunked_command(
+                args.query, args.limit, args.candidate_multiplier)
 
         case _:
             parser.print_help()
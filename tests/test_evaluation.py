@@ -0,0 +1,33 @@
+import numpy
+
+from lib.evaluation import ranking_metrics
+
+def test_query_with_no_matches_retrieves_nothing():
+    # no document matches the query, so every BM25 score is 0
+    scores = numpy.zeros((1, 10))
+    relevance = numpy.zeros((1, 10), dtype=bool)
+    relevance[0, 0] = True
+
+    metrics = ranking_metrics(scores, relevance, 5, scores > 0)
+
+    assert metrics == {"recall": 0.0, "mrr": 0.0, "ndcg": 0.0}
+
+def test_only_retrieved_documents_count():
+    scores = numpy.array([[0.0, 2.0, 1.0, 0.0]])
+    relevance = numpy.array([[True, False, True, False]])
+
+    metrics = ranking_metrics(scores, relevance, 3, scores > 0)
+
+    # document 2 is retrieved at rank 2; document 0 scores 0 and is not retrieved
+    assert metrics["recall"] == 0.5
+    assert metrics["mrr"] == 0.5
+    ideal_dcg = 1 + 1 / numpy.log2(3)
+    assert numpy.isclose(metrics["ndcg"], (1 / numpy.log2(3)) / ideal_dcg)
+
+def test_all_documents_count_without_mask():
+    scores = numpy.array([[0.9, 0.1, 0.5]])
+    relevance = numpy.array([[True, False, False]])
+
+    metrics = ranking_metrics(scores, relevance, 2)
+
+    assert metrics == {"recall": 1.0, "mrr": 1.0, "ndcg": 1.0}